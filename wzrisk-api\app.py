@@ -1,12 +1,44 @@
+import asyncio
+import contextlib
+import csv
+import gzip
+import hashlib
+import io
 import os
+import threading
+import time
 from datetime import datetime, timezone
 from enum import Enum
 from typing import Optional, List
 
-from fastapi import FastAPI
+import numpy as np
+import orjson
+from fastapi import FastAPI, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.staticfiles import StaticFiles
+from fastapi.datastructures import Headers
+from fastapi.responses import (
+    FileResponse,
+    ORJSONResponse,
+    RedirectResponse,
+    Response,
+    StreamingResponse,
+)
 from pydantic import BaseModel, Field, validator
+from pydantic.error_wrappers import ErrorWrapper
+from pydantic.errors import DictError, ListError, MissingError
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba é opcional; sem ele o lote usa NumPy puro
+    njit = None
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:  # brotli-asgi é opcional; sem ele as respostas usam só gzip
+    BrotliMiddleware = None
 
 
 # =========================
@@ -15,6 +47,7 @@ from pydantic import BaseModel, Field, validator
 app = FastAPI(
     title="WZ-Risk API",
     version="1.8",
+    default_response_class=ORJSONResponse,
     description=(
         "API de classificação de vulnerabilidades com pesos por ENV, "
         "lote (/score/batch) com priorização, atalho compatível (/cve/check) e UI com gráfico e export. "
@@ -30,6 +63,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compressão para respostas grandes (/score/batch, CSV, UI)
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, minimum_size=1024, gzip_fallback=True)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 
 # =========================
 # Enums
@@ -57,6 +96,13 @@ def _env_float(name: str, default: float) -> float:
         return default
 
 
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except Exception:
+        return default
+
+
 def _env_enum(name: str, enum_cls, default):
     val = os.getenv(name)
     if val is None:
@@ -77,6 +123,9 @@ B_ACTIVE = _env_float("WZ_B_ACTIVE", 0.25)
 DEFAULT_CRIT = _env_enum("WZ_DEFAULT_CRIT", Crit, Crit.media)
 DEFAULT_EXPO = _env_enum("WZ_DEFAULT_EXPO", Exposure, Exposure.interna)
 
+# Sem Numba, lotes com pelo menos N itens são calculados fora do event loop
+BATCH_THREAD_MIN = _env_int("WZ_BATCH_THREAD_MIN", 500)
+
 
 # =========================
 # Schemas
@@ -107,6 +156,10 @@ class FindingIn(BaseModel):
             return v.replace(tzinfo=timezone.utc)
         return v
 
+    # Achados não mudam depois de validados (FindingOut herda)
+    class Config:
+        frozen = True
+
 
 class FindingOut(FindingIn):
     asset_criticality: Optional[Crit]
@@ -117,6 +170,37 @@ class FindingOut(FindingIn):
     work_order: Optional[int] = Field(None, description="Ordem global")
 
 
+# Monta a saída campo a campo a partir de um FindingIn já validado (sem .dict(),
+# sem revalidar). asset_criticality/exposure chegam resolvidos com os padrões do ENV.
+def _to_out(
+    inp: FindingIn,
+    score: float,
+    level: str,
+    expl: str,
+    crit: Crit,
+    expo: Exposure,
+    work_order: Optional[int] = None,
+) -> FindingOut:
+    return FindingOut.construct(
+        id=inp.id,
+        product=inp.product,
+        host=inp.host,
+        agent=inp.agent,
+        cvss=inp.cvss,
+        published=inp.published,
+        summary=inp.summary,
+        asset_criticality=crit,
+        has_known_exploit=inp.has_known_exploit,
+        is_actively_exploited=inp.is_actively_exploited,
+        exposure=expo,
+        years=inp.years,
+        risk_score=round(score, 2),
+        risk_level=level,
+        explanation=expl,
+        work_order=work_order,
+    )
+
+
 # =========================
 # Modelo de risco
 # =========================
@@ -134,40 +218,37 @@ EXPO_WEIGHTS = {
 }
 
 
-def clamp(x: float, lo: float = 0.0, hi: float = 1.0) -> float:
-    return max(lo, min(hi, x))
+# Parcelas fixas de criticidade (W_CRIT*crit_w) e exposição (W_EXPO*expo_w).
+# Ficam separadas e são somadas na mesma ordem da fórmula original: juntar as duas
+# num termo só muda o arredondamento e pode trocar o nível perto de 40/70/90.
+_CRIT_TERM = {c: W_CRIT * CRIT_WEIGHTS[c] for c in Crit}
+_EXPO_TERM = {e: W_EXPO * EXPO_WEIGHTS[e] for e in Exposure}
+
+
+SECONDS_PER_YEAR = 365.25 * 86400
 
 
-def years_since(pub: datetime) -> float:
-    now = datetime.now(timezone.utc)
-    delta = now - pub
-    return delta.days / 365.25
+def years_since(pub: datetime, now_ts: Optional[float] = None) -> float:
+    if now_ts is None:
+        now_ts = time.time()
+    return (now_ts - pub.timestamp()) / SECONDS_PER_YEAR
 
 
-def calc_score(data: FindingIn):
+def calc_score(data: FindingIn, now_ts: Optional[float] = None, explain: bool = True):
     asset_crit = data.asset_criticality or DEFAULT_CRIT
     exposure = data.exposure or DEFAULT_EXPO
 
-    cvss_n = clamp(data.cvss / 10.0)
-    crit_w = CRIT_WEIGHTS[asset_crit]
-    expo_w = EXPO_WEIGHTS[exposure]
+    cvss_n = data.cvss / 10.0
+    cvss_n = 0.0 if cvss_n < 0.0 else 1.0 if cvss_n > 1.0 else cvss_n
 
-    yrs = years_since(data.published) if data.years is None else max(0.0, data.years)
-    recency_factor = clamp(1.0 - clamp(yrs / 10.0))
-
-    if yrs <= 1:
-        recency_msg = f"A vulnerabilidade é muito recente (~{yrs:.2f} ano)."
-    elif yrs <= 3:
-        recency_msg = f"Publicada há {yrs:.2f} anos (ainda recente)."
-    elif yrs <= 10:
-        recency_msg = f"Publicada há {yrs:.2f} anos (perde peso com a idade)."
-    else:
-        recency_msg = f"Antiga (~{yrs:.2f} anos), impacto por recência é baixo."
+    yrs = years_since(data.published, now_ts) if data.years is None else max(0.0, data.years)
+    age = yrs / 10.0
+    recency_factor = 1.0 if age < 0.0 else 0.0 if age > 1.0 else 1.0 - age
 
     base = (
         W_CVSS * cvss_n
-        + W_CRIT * crit_w
-        + W_EXPO * expo_w
+        + _CRIT_TERM[asset_crit]
+        + _EXPO_TERM[exposure]
         + W_RECENCY * recency_factor
     )
     if data.has_known_exploit:
@@ -175,7 +256,7 @@ def calc_score(data: FindingIn):
     if data.is_actively_exploited:
         base += B_ACTIVE
 
-    score = clamp(base) * 100.0
+    score = (0.0 if base < 0.0 else 1.0 if base > 1.0 else base) * 100.0
 
     if score >= 90:
         level = "CRITICAL"
@@ -186,36 +267,216 @@ def calc_score(data: FindingIn):
     else:
         level = "LOW"
 
-    expl = []
-    expl.append(f"CVSS informado: {data.cvss:.1f} (peso {W_CVSS:.2f}).")
-    expl.append(f"Criticidade do ativo: {asset_crit.value} (fator {crit_w:.2f}, peso {W_CRIT:.2f}).")
-    expl.append(f"Exposição: {exposure.value} (fator {expo_w:.2f}, peso {W_EXPO:.2f}).")
-    expl.append(f"Recência: {recency_msg} (peso {W_RECENCY:.2f}).")
-    if data.has_known_exploit:
-        expl.append(f"Há exploit conhecido (+{int(B_EXPLOIT*100)} pontos base).")
-    if data.is_actively_exploited:
-        expl.append(f"Exploração ativa em campo (+{int(B_ACTIVE*100)} pontos base).")
+    expl = ""
+    if explain:
+        expl = explain_score(
+            data.cvss, asset_crit, exposure, yrs,
+            data.has_known_exploit, data.is_actively_exploited, score, level,
+        )
+    return score, level, expl, asset_crit, exposure
+
+
+# Trechos da explicação que dependem só dos pesos (fixos após a importação)
+_EXPL_CVSS = f"(peso {W_CVSS:.2f})."
+_EXPL_CRIT = {
+    c: f"Criticidade do ativo: {c.value} (fator {CRIT_WEIGHTS[c]:.2f}, peso {W_CRIT:.2f})."
+    for c in Crit
+}
+_EXPL_EXPO = {
+    e: f"Exposição: {e.value} (fator {EXPO_WEIGHTS[e]:.2f}, peso {W_EXPO:.2f})."
+    for e in Exposure
+}
+_EXPL_RECENCY = f"(peso {W_RECENCY:.2f})."
+_RECENCY_TEMPLATES = (
+    "A vulnerabilidade é muito recente (~{:.2f} ano).",
+    "Publicada há {:.2f} anos (ainda recente).",
+    "Publicada há {:.2f} anos (perde peso com a idade).",
+    "Antiga (~{:.2f} anos), impacto por recência é baixo.",
+)
+_EXPL_EXPLOIT = f"Há exploit conhecido (+{int(B_EXPLOIT*100)} pontos base)."
+_EXPL_ACTIVE = f"Exploração ativa em campo (+{int(B_ACTIVE*100)} pontos base)."
+
+
+def explain_score(
+    cvss: float,
+    asset_crit: Crit,
+    exposure: Exposure,
+    yrs: float,
+    known: bool,
+    active: bool,
+    score: float,
+    level: str,
+) -> str:
+    idx = 0 if yrs <= 1 else 1 if yrs <= 3 else 2 if yrs <= 10 else 3
+    recency_msg = _RECENCY_TEMPLATES[idx].format(yrs)
+
+    expl = [
+        f"CVSS informado: {cvss:.1f} {_EXPL_CVSS}",
+        _EXPL_CRIT[asset_crit],
+        _EXPL_EXPO[exposure],
+        f"Recência: {recency_msg} {_EXPL_RECENCY}",
+    ]
+    if known:
+        expl.append(_EXPL_EXPLOIT)
+    if active:
+        expl.append(_EXPL_ACTIVE)
     expl.append(f"Score final: {score:.2f} → nível {level}.")
 
-    return score, level, " ".join(expl), asset_crit, exposure
+    return " ".join(expl)
+
+
+# Níveis por código (o código é também a prioridade na ordenação do lote)
+_LEVELS = ("CRITICAL", "HIGH", "MEDIUM", "LOW")
+
+# Enums por código, para o lote em arrays (SoA): as parcelas e os pesos viram
+# vetores indexados pelo código
+_CRITS = tuple(Crit)
+_EXPOS = tuple(Exposure)
+_CRIT_IDX = {c: i for i, c in enumerate(_CRITS)}
+_EXPO_IDX = {e: i for i, e in enumerate(_EXPOS)}
+_CRIT_TERM_ARR = np.array([_CRIT_TERM[c] for c in _CRITS])
+_EXPO_TERM_ARR = np.array([_EXPO_TERM[e] for e in _EXPOS])
+_CRIT_W_ARR = np.array([CRIT_WEIGHTS[c] for c in _CRITS])
+_EXPO_W_ARR = np.array([EXPO_WEIGHTS[e] for e in _EXPOS])
+
+# Mesma fórmula de calc_score, aplicada ao lote inteiro (um elemento por achado).
+# Os pesos entram como argumentos para não ficarem congelados no cache do Numba.
+if njit is not None:
+
+    @njit(cache=True, parallel=True)
+    def _score_kernel(cvss, crit_idx, expo_idx, yrs, known, active, crit_term, expo_term,
+                      w_cvss, w_recency, b_exploit, b_active, out_score, out_level):
+        for i in prange(cvss.shape[0]):
+            cvss_n = cvss[i] / 10.0
+            if cvss_n < 0.0:
+                cvss_n = 0.0
+            elif cvss_n > 1.0:
+                cvss_n = 1.0
+
+            age = yrs[i] / 10.0
+            if age < 0.0:
+                recency_factor = 1.0
+            elif age > 1.0:
+                recency_factor = 0.0
+            else:
+                recency_factor = 1.0 - age
+
+            base = (
+                w_cvss * cvss_n
+                + crit_term[crit_idx[i]]
+                + expo_term[expo_idx[i]]
+                + w_recency * recency_factor
+            )
+            if known[i]:
+                base += b_exploit
+            if active[i]:
+                base += b_active
+            if base < 0.0:
+                base = 0.0
+            elif base > 1.0:
+                base = 1.0
+
+            score = base * 100.0
+            out_score[i] = score
+            if score >= 90:
+                out_level[i] = 0
+            elif score >= 70:
+                out_level[i] = 1
+            elif score >= 40:
+                out_level[i] = 2
+            else:
+                out_level[i] = 3
+
+else:
+
+    def _score_kernel(cvss, crit_idx, expo_idx, yrs, known, active, crit_term, expo_term,
+                      w_cvss, w_recency, b_exploit, b_active, out_score, out_level):
+        recency_factor = 1.0 - np.clip(yrs / 10.0, 0.0, 1.0)
+        base = (
+            w_cvss * np.clip(cvss / 10.0, 0.0, 1.0)
+            + crit_term[crit_idx]
+            + expo_term[expo_idx]
+            + w_recency * recency_factor
+            + b_exploit * known
+            + b_active * active
+        )
+        out_score[:] = np.clip(base, 0.0, 1.0) * 100.0
+        out_level[:] = np.select(
+            [out_score >= 90, out_score >= 70, out_score >= 40], [0, 1, 2], default=3
+        )
+
+
+# O threading layer padrão do Numba não aceita chamadas paralelas concorrentes, então
+# as chamadas do kernel são serializadas. Com Numba todo lote roda em thread (ver
+# _batch_in_thread), e o lock nunca é segurado no event loop. O NumPy não precisa dele.
+_KERNEL_LOCK = threading.Lock() if njit is not None else contextlib.nullcontext()
+
+
+def calc_score_arrays(cvss, crit_idx, expo_idx, yrs, known, active):
+    n = cvss.shape[0]
+    score = np.empty(n, dtype=np.float64)
+    level = np.empty(n, dtype=np.int8)
+    with _KERNEL_LOCK:
+        _score_kernel(
+            cvss, crit_idx, expo_idx, yrs, known, active, _CRIT_TERM_ARR, _EXPO_TERM_ARR,
+            W_CVSS, W_RECENCY, B_EXPLOIT, B_ACTIVE, score, level,
+        )
+    return score, level
+
+
+# Lote em Struct-of-Arrays (SoA): cvss, crit_idx, expo_idx, yrs, known, active
+def _new_batch_arrays(n: int):
+    return (
+        np.empty(n, dtype=np.float64),
+        np.empty(n, dtype=np.uint8),
+        np.empty(n, dtype=np.uint8),
+        np.empty(n, dtype=np.float64),
+        np.empty(n, dtype=np.uint8),
+        np.empty(n, dtype=np.uint8),
+    )
+
+
+# Preenche a posição i dos arrays a partir de campos já validados
+def _fill_batch_row(arrays, i, cvss, crit, expo, published, years, known, active, now_ts):
+    a_cvss, a_crit, a_expo, a_yrs, a_known, a_active = arrays
+    a_cvss[i] = cvss
+    a_crit[i] = _CRIT_IDX[crit or DEFAULT_CRIT]
+    a_expo[i] = _EXPO_IDX[expo or DEFAULT_EXPO]
+    a_yrs[i] = years_since(published, now_ts) if years is None else max(0.0, years)
+    a_known[i] = known
+    a_active[i] = active
+
+
+# Uma passada só lendo atributos, sem aritmética
+def pack_batch(items: List[FindingIn], now_ts: float):
+    arrays = _new_batch_arrays(len(items))
+    for i, item in enumerate(items):
+        _fill_batch_row(
+            arrays, i, item.cvss, item.asset_criticality, item.exposure, item.published,
+            item.years, item.has_known_exploit, item.is_actively_exploited, now_ts,
+        )
+    return arrays
+
+
+# Compila o kernel na importação, não no primeiro request
+calc_score_arrays(
+    np.zeros(1), np.zeros(1, np.uint8), np.zeros(1, np.uint8),
+    np.zeros(1), np.zeros(1, np.uint8), np.zeros(1, np.uint8),
+)
 
 
 # =========================
 # Endpoints
 # =========================
 @app.get("/", include_in_schema=False)
-def root_redirect():
-    return RedirectResponse(url="/ui")
-
-
-@app.get("/health")
-def health():
-    return {"status": "ok", "ts": datetime.now(timezone.utc).isoformat()}
+async def root_redirect():
+    return RedirectResponse(url="/ui/")
 
 
-@app.get("/config")
-def config():
-    return {
+# Respostas fixas: a config só muda com restart; a hora do servidor vai no header Date
+_HEALTH_JSON = b'{"status":"ok"}'
+_CONFIG_JSON = orjson.dumps(
+    {
         "DEFAULT_CRIT": DEFAULT_CRIT.value,
         "DEFAULT_EXPO": DEFAULT_EXPO.value,
         "W_CVSS": W_CVSS,
@@ -225,506 +486,386 @@ def config():
         "B_EXPLOIT": B_EXPLOIT,
         "B_ACTIVE": B_ACTIVE,
     }
+)
+_CONFIG_ETAG = '"' + hashlib.sha1(_CONFIG_JSON).hexdigest() + '"'
+_CONFIG_HEADERS = {"Cache-Control": "public, max-age=60", "ETag": _CONFIG_ETAG}
+
+
+@app.get("/health")
+async def health():
+    return Response(_HEALTH_JSON, media_type="application/json")
 
 
-@app.post("/score", response_model=FindingOut, tags=["core"])
-def score_endpoint(inp: FindingIn):
+@app.get("/config")
+async def config(request: Request):
+    if request.headers.get("if-none-match") == _CONFIG_ETAG:
+        return Response(status_code=304, headers=_CONFIG_HEADERS)
+    return Response(_CONFIG_JSON, media_type="application/json", headers=_CONFIG_HEADERS)
+
+
+# As rotas de score devolvem ORJSONResponse direto: a saída é montada aqui a partir
+# de entradas já validadas, então a validação do response_model seria repetida à toa.
+# O schema continua documentado via `responses`.
+@app.post("/score", responses={200: {"model": FindingOut}}, tags=["core"])
+async def score_endpoint(inp: FindingIn):
     s, lvl, expl, crit_res, expo_res = calc_score(inp)
-    base = inp.dict(exclude={"asset_criticality", "exposure"})
-    return FindingOut(
-        **base,
-        asset_criticality=crit_res,
-        exposure=expo_res,
-        risk_score=round(s, 2),
-        risk_level=lvl,
-        explanation=expl,
-    )
+    return ORJSONResponse(_to_out(inp, s, lvl, expl, crit_res, expo_res).dict())
 
 
 class BatchIn(BaseModel):
     items: List[FindingIn] = Field(..., description="Lista de achados")
 
+    class Config:
+        frozen = True
 
-@app.post("/score/batch", response_model=List[FindingOut], tags=["core"])
-def score_batch(payload: BatchIn):
-    ranked = []
-    for idx, item in enumerate(payload.items):
-        s, lvl, expl, crit_res, expo_res = calc_score(item)
-        level_rank = {"CRITICAL": 0, "HIGH": 1, "MEDIUM": 2, "LOW": 3}[lvl]
-        expo_w = EXPO_WEIGHTS[expo_res]
-        crit_w = CRIT_WEIGHTS[crit_res]
-        active = 1 if item.is_actively_exploited else 0
-        known = 1 if item.has_known_exploit else 0
-
-        res = FindingOut(
-            **item.dict(exclude={"asset_criticality", "exposure"}),
-            asset_criticality=crit_res,
-            exposure=expo_res,
-            risk_score=round(s, 2),
-            risk_level=lvl,
-            explanation=expl,
-        )
-        ranked.append((level_rank, -s, -active, -known, -expo_w, -crit_w, idx, res))
 
-    ranked.sort(key=lambda t: (t[0], t[1], t[2], t[3], t[4], t[5], t[6]))
-    ordered = [t[-1] for t in ranked]
-    for i, obj in enumerate(ordered, start=1):
-        obj.work_order = i
-    return ordered
+# Prioridade do lote num único inteiro (menor = atender antes):
+# nível | score desc | exploração ativa | exploit conhecido | exposição | criticidade
+def _priority_keys(scores, levels, knowns, actives, expo_ws, crit_ws):
+    return (
+        (levels.astype(np.int64) << 56)
+        | (np.rint((100.0 - scores) * 1e6).astype(np.int64) << 24)
+        | ((1 - actives).astype(np.int64) << 23)
+        | ((1 - knowns).astype(np.int64) << 22)
+        | (np.rint((1.0 - expo_ws) * 1000).astype(np.int64) << 12)
+        | (np.rint((1.0 - crit_ws) * 1000).astype(np.int64) << 2)
+    )
 
 
-class CVECheckIn(BaseModel):
-    id: str
-    cvss: float = Field(..., ge=0, le=10)
-    published: datetime
-    summary: Optional[str] = ""
-    product: Optional[str] = None
-    host: Optional[str] = None
-    agent: Optional[str] = None
-    has_known_exploit: bool = False
-    is_actively_exploited: bool = False
-    asset_criticality: Optional[Crit] = None
-    exposure: Optional[Exposure] = None
-    years: Optional[float] = None
+def _rank_batch(cvss, crit_idx, expo_idx, yrs, knowns, actives):
+    scores, levels = calc_score_arrays(cvss, crit_idx, expo_idx, yrs, knowns, actives)
+    keys = _priority_keys(
+        scores, levels, knowns, actives, _EXPO_W_ARR[expo_idx], _CRIT_W_ARR[crit_idx]
+    )
+    # estável: empates mantêm a ordem de entrada
+    order = np.argsort(keys, kind="stable")
+    return order, scores, levels
+
+
+# Campos calculados do item idx do lote, na mesma ordem de calc_score:
+# (score, nível, explicação, criticidade resolvida, exposição resolvida)
+def _ranked_result(idx: int, arrays, scores, levels, explain: bool):
+    cvss, crit_idx, expo_idx, yrs, knowns, actives = arrays
+    s = float(scores[idx])
+    lvl = _LEVELS[levels[idx]]
+    crit_res = _CRITS[crit_idx[idx]]
+    expo_res = _EXPOS[expo_idx[idx]]
+    expl = ""
+    if explain:
+        expl = explain_score(
+            float(cvss[idx]), crit_res, expo_res, float(yrs[idx]),
+            bool(knowns[idx]), bool(actives[idx]), s, lvl,
+        )
+    return s, lvl, expl, crit_res, expo_res
+
+
+def _compute_batch(items: List[FindingIn], explain: bool = True) -> List[FindingOut]:
+    arrays = pack_batch(items, time.time())
+    order, scores, levels = _rank_batch(*arrays)
+    return [
+        _to_out(items[idx], *_ranked_result(idx, arrays, scores, levels, explain), work_order)
+        for work_order, idx in enumerate(order.tolist(), start=1)
+    ]
+
+
+# Com Numba, qualquer lote: o kernel espera o _KERNEL_LOCK, o que travaria o loop.
+# Com NumPy, só lotes com pelo menos BATCH_THREAD_MIN itens.
+def _batch_in_thread(n: int) -> bool:
+    return njit is not None or n >= BATCH_THREAD_MIN
+
+
+# Roda fn(items, *args) no loop ou em thread, conforme _batch_in_thread
+async def _run_batch(fn, items: list, *args):
+    if _batch_in_thread(len(items)):
+        return await asyncio.to_thread(fn, items, *args)
+    return fn(items, *args)
+
+
+@app.post("/score/batch", responses={200: {"model": List[FindingOut]}}, tags=["core"])
+async def score_batch(payload: BatchIn, explain: bool = True):
+    ordered = await _run_batch(_compute_batch, payload.items, explain)
+    return ORJSONResponse([o.dict() for o in ordered])
+
+
+CSV_HEADER = [
+    "work_order", "id", "product", "host", "agent", "cvss", "published",
+    "asset_criticality", "exposure", "has_known_exploit", "is_actively_exploited",
+    "risk_score", "risk_level",
+]
+CSV_CHUNK_ROWS = 500
+
+
+def _csv_value(v):
+    if v is None:
+        return ""
+    if isinstance(v, bool):
+        return "true" if v else "false"
+    if isinstance(v, Enum):
+        return v.value
+    if isinstance(v, datetime):
+        return v.isoformat()
+    return v
+
+
+# Só ordena: as linhas do CSV saem dos arrays ranqueados + itens de entrada,
+# sem montar a lista de FindingOut
+def _rank_csv(items: List[FindingIn]):
+    cvss, crit_idx, expo_idx, yrs, knowns, actives = pack_batch(items, time.time())
+    order, scores, levels = _rank_batch(cvss, crit_idx, expo_idx, yrs, knowns, actives)
+    return order.tolist(), scores, levels, crit_idx, expo_idx
+
+
+def _csv_iter(items: List[FindingIn], order, scores, levels, crit_idx, expo_idx):
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(CSV_HEADER)
+    for work_order, idx in enumerate(order, start=1):
+        item = items[idx]
+        writer.writerow([
+            work_order,
+            item.id,
+            _csv_value(item.product),
+            _csv_value(item.host),
+            _csv_value(item.agent),
+            item.cvss,
+            _csv_value(item.published),
+            _CRITS[crit_idx[idx]].value,
+            _EXPOS[expo_idx[idx]].value,
+            _csv_value(item.has_known_exploit),
+            _csv_value(item.is_actively_exploited),
+            round(float(scores[idx]), 2),
+            _LEVELS[levels[idx]],
+        ])
+        if work_order % CSV_CHUNK_ROWS == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+@app.post("/score/batch.csv", responses={200: {"content": {"text/csv": {}}}}, tags=["core"])
+async def score_batch_csv(payload: BatchIn):
+    ranked = await _run_batch(_rank_csv, payload.items)
+    return StreamingResponse(
+        _csv_iter(payload.items, *ranked),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="wzrisk_batch.csv"'},
+    )
 
-    @validator("published")
-    def force_tz2(cls, v: datetime) -> datetime:
-        if v.tzinfo is None:
-            return v.replace(tzinfo=timezone.utc)
-        return v
 
+# =========================
+# Lote "rápido": JSON cru (orjson) direto para os arrays, sem Pydantic por item
+# =========================
+# Valores já no tipo JSON do campo (str, float, bool, enum pelo valor) passam direto;
+# o resto (ausente, null, "9.8", 123, "true", timestamp...) vai para o validador
+# do próprio campo em FindingIn, então a coerção e os 422 são os mesmos de
+# /score/batch. `published` sempre passa pelo validador (date-only é rejeitado).
+# Diferença: o 422 traz só o primeiro erro encontrado, não todos.
+_FINDING_FIELDS = FindingIn.__fields__
+_CRIT_BY_VALUE = {c.value: c for c in Crit}
+_EXPO_BY_VALUE = {e.value: e for e in Exposure}
+_MISSING = object()
+
+
+def _raw_invalid(exc: Exception, loc: tuple) -> RequestValidationError:
+    return RequestValidationError([ErrorWrapper(exc, loc=loc)])
+
+
+def _raw_validate(raw: dict, idx: int, name: str):
+    field = _FINDING_FIELDS[name]
+    loc = ("body", "items", idx, name)
+    v = raw.get(name, _MISSING)
+    if v is _MISSING:
+        if field.required:
+            raise _raw_invalid(MissingError(), loc)
+        return field.get_default()
+    value, errors = field.validate(v, {}, loc=loc, cls=FindingIn)
+    if errors:
+        raise RequestValidationError([errors])
+    return value
+
+
+def _raw_str(raw: dict, idx: int, name: str) -> Optional[str]:
+    v = raw.get(name)
+    if v is not None and type(v) is not str:
+        return _raw_validate(raw, idx, name)
+    return v
+
+
+def _raw_bool(raw: dict, idx: int, name: str) -> bool:
+    v = raw.get(name, False)
+    if type(v) is not bool:
+        return _raw_validate(raw, idx, name)
+    return v
+
+
+def _raw_enum(raw: dict, idx: int, name: str, by_value: dict):
+    v = raw.get(name)
+    if v is None:
+        return None
+    member = by_value.get(v) if type(v) is str else None
+    if member is None:
+        return _raw_validate(raw, idx, name)
+    return member
+
+
+# Valida cada item e preenche os arrays (SoA) na mesma passada; devolve também
+# os registros normalizados para a saída.
+def pack_raw_batch(items: list, now_ts: float):
+    arrays = _new_batch_arrays(len(items))
+    records = []
+    for i, raw in enumerate(items):
+        if not isinstance(raw, dict):
+            try:
+                raw = dict(raw)
+            except (TypeError, ValueError):
+                raise _raw_invalid(DictError(), ("body", "items", i))
+
+        item_id = raw.get("id")
+        if type(item_id) is not str:
+            item_id = _raw_validate(raw, i, "id")
+        score_in = raw.get("cvss")
+        if type(score_in) is not float or not 0 <= score_in <= 10:
+            score_in = _raw_validate(raw, i, "cvss")
+        published = _raw_validate(raw, i, "published")
+        summary = raw.get("summary", "")
+        if type(summary) is not str:
+            summary = _raw_validate(raw, i, "summary")
+        crit = _raw_enum(raw, i, "asset_criticality", _CRIT_BY_VALUE)
+        expo = _raw_enum(raw, i, "exposure", _EXPO_BY_VALUE)
+        has_known = _raw_bool(raw, i, "has_known_exploit")
+        is_active = _raw_bool(raw, i, "is_actively_exploited")
+        years = raw.get("years")
+        if years is not None and type(years) is not float:
+            years = _raw_validate(raw, i, "years")
+
+        # mesma ordem de campos de FindingOut
+        records.append({
+            "id": item_id,
+            "product": _raw_str(raw, i, "product"),
+            "host": _raw_str(raw, i, "host"),
+            "agent": _raw_str(raw, i, "agent"),
+            "cvss": score_in,
+            "published": published,
+            "summary": summary,
+            "asset_criticality": crit,
+            "has_known_exploit": has_known,
+            "is_actively_exploited": is_active,
+            "exposure": expo,
+            "years": years,
+        })
+        _fill_batch_row(
+            arrays, i, score_in, crit, expo, published, years, has_known, is_active, now_ts
+        )
+    return records, arrays
+
+
+def _compute_raw_batch(items: list, explain: bool = True) -> list:
+    records, arrays = pack_raw_batch(items, time.time())
+    order, scores, levels = _rank_batch(*arrays)
+
+    ordered = []
+    for work_order, idx in enumerate(order.tolist(), start=1):
+        s, lvl, expl, crit_res, expo_res = _ranked_result(idx, arrays, scores, levels, explain)
+        rec = records[idx]
+        rec["asset_criticality"] = crit_res
+        rec["exposure"] = expo_res
+        rec["risk_score"] = round(s, 2)
+        rec["risk_level"] = lvl
+        rec["explanation"] = expl
+        rec["work_order"] = work_order
+        ordered.append(rec)
+    return ordered
 
-@app.post("/cve/check", response_model=FindingOut, tags=["compat"])
-def cve_check_endpoint(inp: CVECheckIn):
-    as_finding = FindingIn(**inp.dict())
-    s, lvl, expl, crit_res, expo_res = calc_score(as_finding)
-    base = as_finding.dict(exclude={"asset_criticality", "exposure"})
-    return FindingOut(
-        **base,
-        asset_criticality=crit_res,
-        exposure=expo_res,
-        risk_score=round(s, 2),
-        risk_level=lvl,
-        explanation=expl,
-    )
+
+@app.post(
+    "/score/batch/fast",
+    responses={200: {"model": List[FindingOut]}},
+    openapi_extra={
+        "requestBody": {
+            "content": {"application/json": {"schema": {"$ref": "#/components/schemas/BatchIn"}}},
+            "required": True,
+        }
+    },
+    tags=["core"],
+    description=(
+        "Mesmo contrato de /score/batch (mesma coerção de tipos e mesmos 422), "
+        "validando o JSON direto para arrays; o 422 traz só o primeiro erro."
+    ),
+)
+async def score_batch_fast(request: Request, explain: bool = True):
+    body = await request.body()
+    if not body:
+        raise _raw_invalid(MissingError(), ("body",))
+    try:
+        payload = orjson.loads(body)
+    except orjson.JSONDecodeError as e:
+        raise _raw_invalid(e, ("body", e.pos))
+    if not isinstance(payload, dict):
+        raise _raw_invalid(DictError(), ("body",))
+    items = payload.get("items", _MISSING)
+    if items is _MISSING:
+        raise _raw_invalid(MissingError(), ("body", "items"))
+    if not isinstance(items, list):
+        raise _raw_invalid(ListError(), ("body", "items"))
+
+    ordered = await _run_batch(_compute_raw_batch, items, explain)
+    return ORJSONResponse(ordered)
+
+
+@app.post("/cve/check", responses={200: {"model": FindingOut}}, tags=["compat"])
+async def cve_check_endpoint(inp: FindingIn):
+    s, lvl, expl, crit_res, expo_res = calc_score(inp)
+    return ORJSONResponse(_to_out(inp, s, lvl, expl, crit_res, expo_res).dict())
 
 
 # =========================
 # UI (HTML) — abas, visão geral e detalhe por agente
 # =========================
-HTML = """
-<!doctype html>
-<html lang="pt-br">
-<head>
-  <meta charset="utf-8" />
-  <title>WZ-Risk — Classificador</title>
-  <meta name="viewport" content="width=device-width, initial-scale=1" />
-  <style>
-    :root { font-family: system-ui, -apple-system, Segoe UI, Roboto, Arial; }
-    body { margin: 24px; color: #111; max-width: 1200px; }
-    h1 { font-size: 22px; margin: 0 0 12px; }
-    .muted { color: #666; font-size: 12px; }
-    input, select, textarea { padding:8px; border:1px solid #ddd; border-radius:6px; width:100%; }
-    textarea { min-height: 180px; font-family: monospace; }
-    button { padding:8px 12px; border:0; border-radius:6px; background:#2563eb; color:#fff; cursor:pointer; }
-    button:hover { background:#1d4ed8; }
-    .btn-row { display:flex; gap:8px; align-items:center; flex-wrap:wrap; }
-    .card { border:1px solid #eee; border-radius:8px; padding:14px; margin-top:14px; background:#fff; }
-    .error { background:#fee2e2; color:#7f1d1d; border:1px solid #fecaca; padding:10px; border-radius:8px; margin-top:8px; }
-    table { width:100%; border-collapse: collapse; margin-top:10px; }
-    th, td { padding:8px 10px; border-bottom:1px solid #eee; text-align:left; vertical-align:middle; }
-    th { background:#fafafa; font-size:12px; color:#444; }
-    .badge { padding:2px 8px; border-radius:999px; color:#fff; font-size:12px; }
-    .b-crit{background:#dc2626}.b-high{background:#ea580c}.b-med{background:#d97706}.b-low{background:#059669}
-    .bar { height: 10px; background:#eee; border-radius:999px; overflow:hidden; min-width:160px; }
-    .fill { height:100%; border-radius:999px; background: linear-gradient(90deg,#60a5fa,#2563eb); }
-    .canvas-wrap { border:1px solid #eee; border-radius:8px; padding:10px; margin-top:10px; background:#fff; }
-    .mono { font-family: ui-monospace, SFMono-Regular, Menlo, Consolas, "Liberation Mono", monospace; }
-    .tabs { display:flex; gap:8px; margin-top:8px; }
-    .tab { padding:8px 12px; border-radius:8px; border:1px solid #ddd; cursor:pointer; }
-    .tab.active { background:#2563eb; color:#fff; border-color:#2563eb; }
-    .controls { display:flex; gap:10px; align-items:center; flex-wrap:wrap; margin: 8px 0 12px; }
-    .grid { display: grid; grid-template-columns: 1fr; gap: 16px; }
-  </style>
-</head>
-<body>
-  <h1>WZ-Risk — Classificador</h1>
-  <p class="muted">Cole uma lista JSON ou carregue um arquivo. O resultado sai na tabela e no(s) gráfico(s) (PNG).</p>
-
-  <div class="card"><div id="cfg" class="muted">Carregando config...</div></div>
-
-  <div class="card">
-    <div class="btn-row" style="margin-bottom:8px;">
-      <input type="file" id="file" accept="application/json" />
-      <button id="load-file">Carregar arquivo</button>
-      <button id="btn-batch">Classificar Lote</button>
-      <button id="export-csv">Exportar CSV</button>
-      <button id="export-json">Exportar JSON</button>
-    </div>
-
-    <textarea id="batch-input">{
-  "items": [
-    {
-      "id": "CVE-2024-0001",
-      "product": "Windows",
-      "host": "SERVER-2016",
-      "agent": "agent-win-01",
-      "cvss": 9.8,
-      "published": "2024-01-10T00:00:00Z",
-      "asset_criticality": "alta",
-      "exposure": "internet",
-      "has_known_exploit": true,
-      "is_actively_exploited": true
-    },
-    {
-      "id": "CVE-2023-1000",
-      "product": "Ubuntu 24.04",
-      "host": "UBUNTU-2404",
-      "agent": "agent-ubu-01",
-      "cvss": 7.4,
-      "published": "2023-05-01T00:00:00Z",
-      "asset_criticality": "media",
-      "exposure": "interna",
-      "has_known_exploit": false,
-      "is_actively_exploited": false
-    },
-    {
-      "id": "CVE-2022-7777",
-      "product": "Fedora 42",
-      "host": "FEDORA-42",
-      "agent": "agent-fed-01",
-      "cvss": 6.1,
-      "published": "2022-06-01T00:00:00Z",
-      "asset_criticality": "baixa",
-      "exposure": "interna",
-      "has_known_exploit": false,
-      "is_actively_exploited": false
-    },
-    {
-      "id": "CVE-2020-9999",
-      "product": "Windows Server 2016",
-      "host": "SERVER-2016",
-      "agent": "agent-win-01",
-      "cvss": 5.0,
-      "published": "2020-06-01T00:00:00Z",
-      "asset_criticality": "baixa",
-      "exposure": "isolada",
-      "has_known_exploit": false,
-      "is_actively_exploited": false
-    }
-  ]
-}</textarea>
-
-    <div id="batch-error"></div>
-
-    <div class="tabs">
-      <div class="tab active" data-tab="overview">Visão Geral</div>
-      <div class="tab" data-tab="detail">Detalhe por Agente</div>
-    </div>
-
-    <!-- OVERVIEW -->
-    <div id="overview" style="display:block;">
-      <div class="controls">
-        <label><b>Top N por agente:</b></label>
-        <select id="topN">
-          <option>1</option><option selected>3</option><option>5</option><option>10</option>
-        </select>
-        <button id="download-png-overview">Baixar gráfico (PNG) — primeira grade</button>
-      </div>
-      <div id="overview-table"></div>
-      <div id="overview-charts" class="grid"></div>
-    </div>
-
-    <!-- DETAIL -->
-    <div id="detail" style="display:none;">
-      <div class="controls">
-        <label><b>Agente:</b></label>
-        <select id="agent-select"></select>
-        <label><b>Severidades:</b></label>
-        <label><input type="checkbox" class="sev" value="CRITICAL" checked/> CRITICAL</label>
-        <label><input type="checkbox" class="sev" value="HIGH" checked/> HIGH</label>
-        <label><input type="checkbox" class="sev" value="MEDIUM" checked/> MEDIUM</label>
-        <label><input type="checkbox" class="sev" value="LOW" checked/> LOW</label>
-        <button id="download-png-detail">Baixar gráfico (PNG) — detalhe</button>
-      </div>
-      <div id="detail-table"></div>
-      <div id="detail-chart" class="grid"></div>
-    </div>
-
-  </div>
-
-<script>
-(function(){
-  var lastBatch = null;
-
-  function setText(el, text){ el.textContent = text; }
-  function byId(id){ return document.getElementById(id); }
-
-  // Tabs
-  document.querySelectorAll('.tab').forEach(function(t){
-    t.addEventListener('click', function(){
-      document.querySelectorAll('.tab').forEach(function(o){ o.classList.remove('active'); });
-      t.classList.add('active');
-      var tab = t.getAttribute('data-tab');
-      byId('overview').style.display = (tab==='overview' ? 'block':'none');
-      byId('detail').style.display = (tab==='detail' ? 'block':'none');
-      if (lastBatch){
-        if (tab==='overview') renderOverview(lastBatch);
-        else renderDetail(lastBatch);
-      }
-    });
-  });
-
-  // Config
-  fetch('/config').then(r=>r.json()).then(function(cfg){
-    setText(byId('cfg'),
-      'DEFAULT_CRIT=' + cfg.DEFAULT_CRIT +
-      ' | DEFAULT_EXPO=' + cfg.DEFAULT_EXPO +
-      ' | W_CVSS=' + cfg.W_CVSS.toFixed(2) +
-      ' | W_CRIT=' + cfg.W_CRIT.toFixed(2) +
-      ' | W_EXPO=' + cfg.W_EXPO.toFixed(2) +
-      ' | W_RECENCY=' + cfg.W_RECENCY.toFixed(2) +
-      ' | B_EXPLOIT=' + cfg.B_EXPLOIT.toFixed(2) +
-      ' | B_ACTIVE=' + cfg.B_ACTIVE.toFixed(2)
-    );
-  }).catch(()=>setText(byId('cfg'),'Falha ao carregar config.'));
-
-  // Carregar arquivo
-  byId('load-file').addEventListener('click', function(){
-    var f = byId('file').files[0];
-    if (!f){ alert('Escolha um arquivo .json'); return; }
-    var reader = new FileReader();
-    reader.onload = e => byId('batch-input').value = e.target.result;
-    reader.readAsText(f);
-  });
-
-  // Classificar lote
-  byId('btn-batch').addEventListener('click', function(){
-    var err = byId('batch-error'); err.innerHTML = '';
-    var payload;
-    try {
-      payload = JSON.parse(byId('batch-input').value);
-      if (!payload.items || !Array.isArray(payload.items)) throw new Error('JSON precisa de {"items":[...]}');
-    } catch(e){ err.innerHTML = '<div class="error">'+e.message+'</div>'; return; }
-
-    fetch('/score/batch', {method:'POST', headers:{'Content-Type':'application/json'}, body:JSON.stringify(payload)})
-      .then(r => r.ok? r.json(): r.text().then(t=>{throw new Error('HTTP '+r.status+' '+t)}))
-      .then(data => { lastBatch = data; renderOverview(data); renderDetail(data); })
-      .catch(e => err.innerHTML = '<div class="error">Erro: '+e.message+'</div>');
-  });
-
-  // Helpers
-  function groupBy(list, key){
-    var map={};
-    list.forEach(it=>{
-      var k = it[key] || '(sem '+key+')';
-      (map[k] = map[k] || []).push(it);
-    });
-    return map;
-  }
-  function sortByRisk(list){
-    return list.slice().sort(function(a,b){
-      var la = {'CRITICAL':0,'HIGH':1,'MEDIUM':2,'LOW':3}[a.risk_level];
-      var lb = {'CRITICAL':0,'HIGH':1,'MEDIUM':2,'LOW':3}[b.risk_level];
-      if (la!==lb) return la-lb;
-      if (a.risk_score !== b.risk_score) return b.risk_score - a.risk_score;
-      return 0;
-    });
-  }
-
-  // ---------- OVERVIEW ----------
-  function renderOverview(data){
-    var container = byId('overview-charts'); container.innerHTML = '';
-    var tableBox = byId('overview-table'); tableBox.innerHTML = '';
-    var perAgent = groupBy(data, 'agent');
-    var topN = parseInt(byId('topN').value, 10) || 3;
-
-    // tabela geral (mostra topN por agente como lista)
-    var html = [];
-    html.push('<div class="card"><h3>Visão Geral — Top '+topN+' por agente</h3>');
-    html.push('<table><thead><tr><th>Agente</th><th>Ordem</th><th>ID/Asset</th><th>Nível</th><th>Score</th></tr></thead><tbody>');
-    Object.keys(perAgent).sort().forEach(function(agent){
-      var ordered = sortByRisk(perAgent[agent]).slice(0, topN);
-      ordered.forEach(function(it, idx){
-        var badge = (it.risk_level==='CRITICAL'?'b-crit':it.risk_level==='HIGH'?'b-high':it.risk_level==='MEDIUM'?'b-med':'b-low');
-        html.push('<tr>');
-        html.push('<td>'+agent+'</td>');
-        html.push('<td>#'+(idx+1)+'</td>');
-        html.push('<td class="mono"><b>'+it.id+'</b> — <span class="muted">'+(it.product||'-')+' @ '+(it.host||'-')+'</span></td>');
-        html.push('<td><span class="badge '+badge+'">'+it.risk_level+'</span></td>');
-        html.push('<td>'+it.risk_score.toFixed(1)+'</td>');
-        html.push('</tr>');
-      });
-    });
-    html.push('</tbody></table></div>');
-    tableBox.innerHTML = html.join('');
-
-    // gráficos (um por agente com topN)
-    Object.keys(perAgent).sort().forEach(function(agent){
-      var wrap = document.createElement('div');
-      wrap.className = 'canvas-wrap';
-      var h = document.createElement('h3');
-      h.textContent = 'Agente: '+agent+' — Top '+topN;
-      wrap.appendChild(h);
-
-      var canvas = document.createElement('canvas');
-      canvas.width = 1000; canvas.height = 380; canvas.style.width='100%';
-      wrap.appendChild(canvas);
-      container.appendChild(wrap);
-
-      var items = sortByRisk(perAgent[agent]).slice(0, topN);
-      drawBars(canvas, items, true);
-    });
-  }
-
-  byId('topN').addEventListener('change', function(){
-    if (lastBatch) renderOverview(lastBatch);
-  });
-
-  byId('download-png-overview').addEventListener('click', function(){
-    var firstCanvas = byId('overview-charts').querySelector('canvas');
-    if (!firstCanvas){ alert('Gere os gráficos primeiro.'); return; }
-    var url = firstCanvas.toDataURL('image/png');
-    var a = document.createElement('a'); a.href=url; a.download='overview.png'; a.click();
-  });
-
-  // ---------- DETAIL ----------
-  function renderDetail(data){
-    // preencher dropdown de agentes
-    var sel = byId('agent-select');
-    var agents = Object.keys(groupBy(data,'agent')).sort();
-    sel.innerHTML = agents.map(a=>'<option>'+a+'</option>').join('');
-    if (!agents.length){ byId('detail-table').innerHTML = ''; byId('detail-chart').innerHTML=''; return; }
-    if (!sel.value) sel.value = agents[0];
-    renderDetailFor(sel.value);
-  }
-
-  function getCheckedSeverities(){
-    return Array.from(document.querySelectorAll('.sev'))
-      .filter(c=>c.checked)
-      .map(c=>c.value);
-  }
-
-  function renderDetailFor(agent){
-    var sev = getCheckedSeverities();
-    var data = lastBatch.filter(it => (it.agent||'(sem agent)') === agent)
-                        .filter(it => sev.indexOf(it.risk_level) !== -1);
-    data = sortByRisk(data);
-    renderDetailTable(agent, data);
-    renderDetailChart(data);
-  }
-
-  byId('agent-select').addEventListener('change', function(){ if (lastBatch) renderDetailFor(this.value); });
-  document.querySelectorAll('.sev').forEach(c => c.addEventListener('change', function(){
-    if (lastBatch) renderDetailFor(byId('agent-select').value);
-  }));
-
-  function renderDetailTable(agent, data){
-    var box = byId('detail-table');
-    var html = [];
-    html.push('<div class="card"><h3>Detalhe do agente: '+agent+' ('+data.length+' itens)</h3>');
-    html.push('<table><thead><tr><th>Ordem</th><th>ID/Asset</th><th>Nível</th><th>Score</th><th>Status</th><th>Exposição</th><th>Criticidade</th></tr></thead><tbody>');
-    data.forEach(function(d, i){
-      var badge = (d.risk_level==='CRITICAL'?'b-crit':d.risk_level==='HIGH'?'b-high':d.risk_level==='MEDIUM'?'b-med':'b-low');
-      html.push('<tr>');
-      html.push('<td>#'+(i+1)+'</td>');
-      html.push('<td class="mono"><b>'+d.id+'</b><br><span class="muted">'+(d.product||'-')+' @ '+(d.host||'-')+'</span></td>');
-      html.push('<td><span class="badge '+badge+'">'+d.risk_level+'</span></td>');
-      html.push('<td style="min-width:160px;"><div class="bar"><div class="fill" style="width:'+d.risk_score+'%"></div></div><div class="muted" style="font-size:11px;">'+d.risk_score.toFixed(1)+' / 100</div></td>');
-      html.push('<td>'+(d.is_actively_exploited?'ativo':'não')+' / '+(d.has_known_exploit?'exploit':'sem exploit')+'</td>');
-      html.push('<td>'+d.exposure+'</td>');
-      html.push('<td>'+d.asset_criticality+'</td>');
-      html.push('</tr>');
-    });
-    html.push('</tbody></table></div>');
-    box.innerHTML = html.join('');
-  }
-
-  function renderDetailChart(list){
-    var box = byId('detail-chart'); box.innerHTML = '';
-    var wrap = document.createElement('div'); wrap.className='canvas-wrap';
-    var h = document.createElement('h3'); h.textContent='Gráfico — detalhe';
-    wrap.appendChild(h);
-    var canvas = document.createElement('canvas');
-    canvas.width = 1000; canvas.height = 380; canvas.style.width='100%';
-    wrap.appendChild(canvas);
-    box.appendChild(wrap);
-    drawBars(canvas, list, false);
-  }
-
-  byId('download-png-detail').addEventListener('click', function(){
-    var firstCanvas = byId('detail-chart').querySelector('canvas');
-    if (!firstCanvas){ alert('Gere o gráfico primeiro.'); return; }
-    var url = firstCanvas.toDataURL('image/png');
-    var a = document.createElement('a'); a.href=url; a.download='detail.png'; a.click();
-  });
-
-  // ---------- DESENHO ----------
-  function drawBars(canvas, data, compact){
-    var ctx = canvas.getContext('2d');
-    var w = Math.min(1200, Math.max(600, data.length * (compact? 120 : 90)));
-    canvas.width = w; canvas.height = 380;
-    ctx.fillStyle = '#fff'; ctx.fillRect(0,0,w,canvas.height);
-
-    var left = 160, top = 30, bottom = 40;
-    var chartW = w - left - 30;
-    var chartH = canvas.height - top - bottom;
-    var gap = 10;
-    var barH = Math.max(12, (chartH - (data.length-1)*gap) / Math.max(1,data.length));
-
-    ctx.font = '12px monospace';
-    ctx.fillStyle = '#111';
-    ctx.fillText('Score (0-100) — ordem do mais crítico para o menos', 10, 18);
-
-    for (var i=0;i<data.length;i++){
-      var it = data[i], y = top + i*(barH + gap);
-
-      ctx.fillStyle = '#eee';
-      ctx.fillRect(left, y, chartW, barH);
-
-      var fillW = Math.round((it.risk_score/100)*chartW);
-      var grad = ctx.createLinearGradient(left, y, left+fillW, y);
-      if      (it.risk_level==='CRITICAL'){ grad.addColorStop(0,'#ff9b9b'); grad.addColorStop(1,'#dc2626'); }
-      else if (it.risk_level==='HIGH'    ){ grad.addColorStop(0,'#ffc59d'); grad.addColorStop(1,'#ea580c'); }
-      else if (it.risk_level==='MEDIUM'  ){ grad.addColorStop(0,'#ffdca8'); grad.addColorStop(1,'#d97706'); }
-      else                                { grad.addColorStop(0,'#aef0d0'); grad.addColorStop(1,'#059669'); }
-      ctx.fillStyle = grad;
-      ctx.fillRect(left, y, fillW, barH);
-
-      ctx.fillStyle = '#111';
-      var label = '#' + (i+1) + ' — ' + it.id + ' (' + it.risk_score.toFixed(1) + ')';
-      ctx.fillText(label, 10, y + barH - 2);
-    }
-  }
-
-  // Export JSON/CSV (dados crus do batch)
-  byId('export-json').addEventListener('click', function(){
-    if (!lastBatch){ alert('Classifique primeiro.'); return; }
-    var blob = new Blob([JSON.stringify(lastBatch, null, 2)], {type:'application/json'});
-    var url = URL.createObjectURL(blob); var a=document.createElement('a');
-    a.href=url; a.download='wzrisk_batch.json'; a.click(); URL.revokeObjectURL(url);
-  });
-
-  byId('export-csv').addEventListener('click', function(){
-    if (!lastBatch){ alert('Classifique primeiro.'); return; }
-    var header = ['work_order','id','product','host','agent','cvss','published','asset_criticality','exposure','has_known_exploit','is_actively_exploited','risk_score','risk_level'];
-    var rows = lastBatch.map(function(it){
-      return header.map(function(k){
-        var v = it[k]; if (v===null||v===undefined) v=''; return String(v).replace(/"/g,'""');
-      }).join(',');
-    });
-    var csv = header.join(',') + "\\n" + rows.join("\\n");
-    var blob = new Blob([csv], {type:'text/csv;charset=utf-8;'});
-    var url = URL.createObjectURL(blob); var a=document.createElement('a');
-    a.href=url; a.download='wzrisk_batch.csv'; a.click(); URL.revokeObjectURL(url);
-  });
-
-})();
-</script>
-</body>
-</html>
-"""
-
-@app.get("/ui", response_class=HTMLResponse, tags=["ui"])
-def ui():
-    return HTML
+# A UI fica em static/index.html, ao lado deste arquivo, e é servida pelo
+# StaticFiles (ETag/Last-Modified a partir do arquivo, só leitura).
+# Para clientes que aceitam gzip, a versão comprimida fica em memória (uma vez por
+# worker e por versão do arquivo); como já sai com Content-Encoding, o middleware de
+# compressão não recomprime a cada hit. Sem gzip, vai o arquivo como está.
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+UI_CACHE_CONTROL = "public, max-age=3600"
+
+
+class GzipStaticFiles(StaticFiles):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._gzip_cache = {}
+
+    def _gzipped(self, full_path, stat_result) -> bytes:
+        key = (stat_result.st_mtime_ns, stat_result.st_size)
+        cached = self._gzip_cache.get(full_path)
+        if cached is None or cached[0] != key:
+            with open(full_path, "rb") as f:
+                cached = (key, gzip.compress(f.read(), compresslevel=9, mtime=0))
+            self._gzip_cache[full_path] = cached
+        return cached[1]
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Request(scope).headers
+        if status_code != 200 or "gzip" not in request_headers.get("accept-encoding", ""):
+            response = super().file_response(full_path, stat_result, scope, status_code)
+            response.headers["Cache-Control"] = UI_CACHE_CONTROL
+            response.headers["Vary"] = "Accept-Encoding"
+            return response
+
+        # ETag/Last-Modified iguais aos do StaticFiles, com ETag próprio para a variante gzip
+        file_headers = FileResponse(full_path, stat_result=stat_result).headers
+        headers = {
+            "ETag": file_headers["etag"] + "-gzip",
+            "Last-Modified": file_headers["last-modified"],
+            "Content-Encoding": "gzip",
+            "Cache-Control": UI_CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
+        }
+        if self.is_not_modified(Headers(headers), request_headers):
+            return Response(status_code=304, headers=headers)
+        headers["Content-Type"] = file_headers["content-type"]
+        return Response(self._gzipped(full_path, stat_result), headers=headers)
+
+
+app.mount("/ui", GzipStaticFiles(directory=STATIC_DIR, html=True), name="ui")
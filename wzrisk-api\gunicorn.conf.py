@@ -0,0 +1,27 @@
+import multiprocessing
+import os
+
+
+# =========================
+# Gunicorn + UvicornWorker
+# =========================
+# Uso: gunicorn -c gunicorn.conf.py app:app
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+# WEB_CONCURRENCY define o número de processos (padrão: nº de CPUs)
+try:
+    workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+except Exception:
+    workers = multiprocessing.cpu_count()
+
+# O kernel Numba (parallel=True) abre um thread por CPU em cada worker; divide as
+# CPUs entre os workers para não ter ~nproc² threads disputando a máquina.
+# Definido aqui, antes do fork, para valer na importação do app em cada worker.
+os.environ.setdefault(
+    "NUMBA_NUM_THREADS", str(max(1, multiprocessing.cpu_count() // max(1, workers)))
+)
+
+# UvicornWorker (pacote uvicorn-worker) usa uvloop/httptools quando instalados
+# (uvicorn[standard])
+worker_class = "uvicorn_worker.UvicornWorker"
+keepalive = 5
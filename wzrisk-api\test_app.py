@@ -0,0 +1,136 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app
+
+
+client = TestClient(app.app)
+
+ITEMS = [
+    {
+        "id": "CVE-2024-0001", "cvss": 9.8, "published": "2024-01-10T00:00:00Z",
+        "asset_criticality": "alta", "exposure": "internet",
+        "has_known_exploit": True, "is_actively_exploited": True,
+        "product": "openssl", "host": "web01", "agent": "agent-a",
+    },
+    {"id": "CVE-2023-0002", "cvss": 7.4, "published": "2023-05-01T00:00:00+03:00"},
+    {"id": "CVE-2022-0003", "cvss": 6.1, "published": "2022-06-01T00:00:00", "summary": None},
+    {"id": "CVE-2020-0004", "cvss": 5.0, "published": "2020-06-01T00:00:00Z", "years": 2.5},
+    # formas que o Pydantic converte: número em string, id inteiro, bool em texto, timestamp
+    {"id": 5, "cvss": "4.3", "published": 1700000000, "has_known_exploit": "true", "years": "12"},
+    {"id": "CVE-2019-0006", "cvss": 0, "published": "2019-01-01 08:30", "is_actively_exploited": 1},
+]
+
+
+@pytest.fixture(autouse=True)
+def fixed_clock(monkeypatch):
+    # as duas rotas calculam a idade com time.time(); fixa o relógio para comparar
+    monkeypatch.setattr(time, "time", lambda: 1760000000.0)
+
+
+@pytest.mark.parametrize("explain", ["true", "false"])
+def test_fast_batch_matches_batch(explain):
+    payload = {"items": ITEMS}
+    strict = client.post(f"/score/batch?explain={explain}", json=payload)
+    fast = client.post(f"/score/batch/fast?explain={explain}", json=payload)
+    assert strict.status_code == fast.status_code == 200
+    assert fast.json() == strict.json()
+    assert [o["work_order"] for o in fast.json()] == list(range(1, len(ITEMS) + 1))
+
+
+def test_fast_batch_empty():
+    resp = client.post("/score/batch/fast", json={"items": []})
+    assert resp.status_code == 200
+    assert resp.json() == []
+
+
+VALID = {"id": "A", "cvss": 9.8, "published": "2024-01-10T00:00:00Z"}
+INVALID_ITEMS = {
+    "missing_id": {"cvss": 9.8, "published": "2024-01-10T00:00:00Z"},
+    "missing_cvss": {"id": "A", "published": "2024-01-10T00:00:00Z"},
+    "missing_published": {"id": "A", "cvss": 9.8},
+    "null_id": dict(VALID, id=None),
+    "id_list": dict(VALID, id=[1]),
+    "cvss_text": dict(VALID, cvss="alto"),
+    "cvss_above": dict(VALID, cvss=10.5),
+    "cvss_below": dict(VALID, cvss=-1),
+    "published_date_only": dict(VALID, published="2024-01-10"),
+    "published_text": dict(VALID, published="ontem"),
+    "crit_unknown": dict(VALID, asset_criticality="altissima"),
+    "expo_unknown": dict(VALID, exposure="dmz"),
+    "exploit_text": dict(VALID, has_known_exploit="talvez"),
+    "exploit_null": dict(VALID, has_known_exploit=None),
+    "active_text": dict(VALID, is_actively_exploited="talvez"),
+    "years_text": dict(VALID, years="dois"),
+    "summary_list": dict(VALID, summary=["a"]),
+    "product_dict": dict(VALID, product={"a": 1}),
+    "item_not_object": 1,
+}
+
+
+@pytest.mark.parametrize("item", INVALID_ITEMS.values(), ids=INVALID_ITEMS.keys())
+def test_fast_batch_rejects_invalid_item(item):
+    payload = {"items": [VALID, item]}
+    strict = client.post("/score/batch", json=payload)
+    fast = client.post("/score/batch/fast", json=payload)
+    assert strict.status_code == fast.status_code == 422
+    assert fast.json() == strict.json()
+    assert fast.json()["detail"][0]["loc"][:3] == ["body", "items", 1]
+
+
+INVALID_BODIES = {
+    "empty": b"",
+    "not_json": b'{"items": [',
+    "not_object": b"[1, 2]",
+    "missing_items": b"{}",
+    "items_not_list": b'{"items": {"id": "A"}}',
+}
+
+
+@pytest.mark.parametrize("body", INVALID_BODIES.values(), ids=INVALID_BODIES.keys())
+def test_fast_batch_rejects_invalid_body(body):
+    headers = {"content-type": "application/json"}
+    assert client.post("/score/batch", content=body, headers=headers).status_code == 422
+    assert client.post("/score/batch/fast", content=body, headers=headers).status_code == 422
+
+
+# Entradas na borda dos níveis: o score tem que sair igual ao da fórmula original,
+# somando as parcelas na mesma ordem (89.99999999999999 vira HIGH, não CRITICAL)
+THRESHOLD_CASES = [
+    ({"cvss": 1.7, "years": 3.5, "asset_criticality": "critica", "exposure": "internet",
+      "has_known_exploit": True, "is_actively_exploited": True}, 90.0, "CRITICAL"),
+    ({"cvss": 1.8, "years": 4.0, "asset_criticality": "critica", "exposure": "internet",
+      "has_known_exploit": True, "is_actively_exploited": True}, 90.0, "CRITICAL"),
+    ({"cvss": 2.8, "years": 3.0, "asset_criticality": "critica", "exposure": "interna",
+      "has_known_exploit": True, "is_actively_exploited": True}, 90.0, "HIGH"),
+    ({"cvss": 3.0, "years": 4.0, "asset_criticality": "critica", "exposure": "interna",
+      "has_known_exploit": True, "is_actively_exploited": True}, 90.0, "HIGH"),
+    ({"cvss": 5.6, "years": 3.0, "asset_criticality": "critica", "exposure": "internet"},
+     70.0, "HIGH"),
+]
+
+
+@pytest.mark.parametrize("fields,score,level", THRESHOLD_CASES)
+def test_threshold_levels(fields, score, level):
+    item = dict(fields, id="T", published="2024-01-10T00:00:00Z")
+    single = client.post("/score", json=item).json()
+    assert (single["risk_score"], single["risk_level"]) == (score, level)
+
+    batch = client.post("/score/batch", json={"items": [item]}).json()
+    assert (batch[0]["risk_score"], batch[0]["risk_level"]) == (score, level)
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "identity"])
+def test_ui_cache_headers(encoding):
+    resp = client.get("/ui/", headers={"accept-encoding": encoding})
+    assert resp.status_code == 200
+    assert resp.headers["cache-control"] == "public, max-age=3600"
+    assert resp.headers.get("content-encoding") == (encoding if encoding == "gzip" else None)
+
+    again = client.get(
+        "/ui/", headers={"accept-encoding": encoding, "if-none-match": resp.headers["etag"]}
+    )
+    assert again.status_code == 304
+    assert again.headers["cache-control"] == "public, max-age=3600"